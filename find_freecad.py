@@ -6,6 +6,18 @@ import sys
 import os
 from pathlib import Path
 
+def _list_dir(path):
+    """Return the set of entry names in path, or None if it cannot be read.
+
+    Names are normalized with os.path.normcase, so lookups are
+    case-insensitive on Windows like Path.exists().
+    """
+    try:
+        with os.scandir(path) as entries:
+            return {os.path.normcase(entry.name) for entry in entries}
+    except OSError:
+        return None
+
 def find_freecad():
     """Search for FreeCAD installation directories."""
     possible_paths = [
@@ -25,21 +37,40 @@ def find_freecad():
             possible_paths.append(Path(f"{drive}FreeCAD {version}"))
             possible_paths.append(Path(f"{drive}Program Files/FreeCAD {version}"))
     
+    # Deduplicate before probing so the same directory is never scanned twice
+    possible_paths = list(dict.fromkeys(possible_paths))
+    
+    # Remember which parent directories exist, so e.g. a missing drive is checked once
+    parent_exists = {}
     for base_path in possible_paths:
-        if not base_path.exists():
+        parent = base_path.parent
+        if parent not in parent_exists:
+            parent_exists[parent] = parent.is_dir()
+        if not parent_exists[parent]:
+            continue
+        
+        base_names = _list_dir(base_path)
+        if base_names is None:
             continue
-            
+
         # Look for typical FreeCAD subdirectories
         for subdir in ["", "bin", "lib", "Mod"]:
+            if subdir and os.path.normcase(subdir) not in base_names:
+                continue
             check_path = base_path / subdir
-            if check_path.exists():
-                # Check if FreeCAD.pyd or FreeCAD.so exists
-                if any((check_path / file).exists() for file in ["FreeCAD.pyd", "FreeCAD.so", "_FreeCAD.pyd"]):
-                    return check_path
-                
-                # Check subdirectories
+            names = base_names if not subdir else _list_dir(check_path)
+            if names is None:
+                continue
+
+            # Check if FreeCAD.pyd or FreeCAD.so exists
+            if any(os.path.normcase(file) in names for file in ["FreeCAD.pyd", "FreeCAD.so", "_FreeCAD.pyd"]):
+                return check_path
+
+            # Check subdirectories
+            if os.path.normcase("lib") in names:
                 lib_path = check_path / "lib"
-                if lib_path.exists() and any((lib_path / file).exists() for file in ["FreeCAD.pyd", "FreeCAD.so"]):
+                lib_names = _list_dir(lib_path)
+                if lib_names and any(os.path.normcase(file) in lib_names for file in ["FreeCAD.pyd", "FreeCAD.so"]):
                     return lib_path
     
     return None
@@ -5,8 +5,35 @@ This script tries to find FreeCAD installation and generates a 3D CAD file.
 """
 import sys
 import os
+import json
 from pathlib import Path
 
+# Sidecar file remembering the FreeCAD bin directory found on a previous run
+FREECAD_PATH_CACHE = Path(os.path.expanduser("~/.freecad_path"))
+
+def has_freecad_binary(base_path):
+    """Check whether a FreeCAD bin directory actually contains the FreeCAD module."""
+    return (base_path / "FreeCAD.pyd").exists() or (base_path.parent / "lib" / "FreeCAD.so").exists()
+
+def load_cached_freecad_path():
+    """Return the FreeCAD bin directory cached by a previous run, if any."""
+    try:
+        with open(FREECAD_PATH_CACHE, 'r') as f:
+            return Path(json.load(f)["path"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_cached_freecad_path(base_path, cached_path=None):
+    """Remember the FreeCAD bin directory for subsequent runs."""
+    os.environ["FREECAD_PATH"] = str(base_path.parent)
+    if base_path == cached_path:
+        return
+    try:
+        with open(FREECAD_PATH_CACHE, 'w') as f:
+            json.dump({"path": str(base_path)}, f)
+    except OSError:
+        pass
+
 def find_and_setup_freecad():
     """Search for FreeCAD and add to sys.path."""
     possible_paths = [
@@ -25,8 +52,14 @@ def find_and_setup_freecad():
     if freecad_path:
         possible_paths.insert(0, Path(freecad_path) / "bin")
     
-    for base_path in possible_paths:
-        if not base_path.exists():
+    # Try the location found on a previous run first
+    cached_path = load_cached_freecad_path()
+    if cached_path:
+        possible_paths.insert(0, cached_path)
+    
+    for base_path in dict.fromkeys(possible_paths):
+        # Skip the import attempt unless the FreeCAD binary is present
+        if not has_freecad_binary(base_path):
             continue
         
         # Add FreeCAD paths to sys.path
@@ -38,6 +71,7 @@ def find_and_setup_freecad():
             import FreeCAD
             print(f"[OK] Found FreeCAD at: {base_path}")
             print(f"[OK] FreeCAD version: {FreeCAD.Version()}")
+            save_cached_freecad_path(base_path, cached_path)
             return True
         except ImportError:
             # Remove the paths and try next location
@@ -1,23 +1,55 @@
 """
 AI-Powered Text-to-CAD Backend with Multi-Object Support
 Uses sklearn ML models: Random Forest, Linear Regression, K-Means
+
+Run directly to serve with waitress, or with gunicorn using a single
+threaded worker:
+    gunicorn -w 1 --threads 8 --chdir web_demo ml_backend:app
+Use one worker process: /retrain updates the models of the process that
+handles it only, and every process writes the same models.joblib.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LinearRegression
 from sklearn.cluster import KMeans
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import json
+import scipy.sparse as sp
+import joblib
+import functools
+import orjson
 import os
-from datetime import datetime
+import threading
+import time
 import re
+from datetime import datetime
+from types import MappingProxyType
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
+app.config["LOG_INTERACTIONS"] = os.environ.get("LOG_INTERACTIONS") == "1"
+
+TRAINING_DATA_FILE = "training_data.jsonl"  # One JSON example per line, appended on retrain
+LEGACY_TRAINING_DATA_FILE = "training_data.json"  # Former JSON array format, migrated on load
+FSYNC_INTERVAL = int(os.environ.get("TRAINING_DATA_FSYNC_INTERVAL", "10"))  # Appends between fsyncs
+MODELS_FILE = "models.joblib"  # Fitted models, reused while newer than the training data
+INTERACTIONS_FILE = "interactions.jsonl"  # Logged /parse-text requests, for later retraining
+
+# Explicit color words, matched with a single compiled pattern
+_COLOR_MAP = MappingProxyType({
+    'red': 0xff4444, 'blue': 0x4444ff, 'green': 0x44ff44,
+    'yellow': 0xffff44, 'purple': 0xff44ff, 'orange': 0xff8844,
+    'cyan': 0x44ffff, 'white': 0xffffff, 'black': 0x222222,
+    'pink': 0xff88cc, 'brown': 0x8b4513, 'gray': 0x888888,
+    'grey': 0x888888
+})
+_COLOR_RE = re.compile(r'\b(' + '|'.join(_COLOR_MAP) + r')\b')
+DEFAULT_COLOR = 0x667eea  # Default purple
 
 # ==========================
 # ML MODELS & TRAINING DATA
@@ -25,16 +57,35 @@ CORS(app)  # Enable CORS for frontend
 
 class TextToCADModel:
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=100)
+        # Stateless hashing front-end: term counts never need a vocabulary refit,
+        # only the IDF weights are recomputed on retraining
+        self.hasher = HashingVectorizer(n_features=2**18, alternate_sign=False, norm=None,
+                                        dtype=np.float32)
+        self.tfidf = TfidfTransformer()
+        self.vectorizer = make_pipeline(self.hasher, self.tfidf)
         self.shape_classifier = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.size_predictor = LinearRegression()
-        self.radius_predictor = LinearRegression()
-        self.height_predictor = LinearRegression()
+        # Single multi-output regressor for size, radius and height
+        self.dimension_predictor = LinearRegression()
         self.position_clusterer = KMeans(n_clusters=8, random_state=42)
+        self._kmeans_fitted = False  # Fitted lazily by predict_position
         
         # Training data storage
         self.training_data = []
+        self._cols = self._build_columns([])
         self.trained = False
+        self._appends_since_sync = 0
+        
+        # Fitted (vectorizer, classifier, regressor) used by predict. Retraining
+        # fits new estimators and swaps this tuple under the lock, so requests
+        # served meanwhile never see half-refitted models.
+        self._lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        self.fitted_models = None
+        self._n_fitted = 0
+        
+        # Memoize ML predictions, keyed on the fitted models snapshot so results
+        # computed with replaced models are never served; cleared on retraining
+        self._predict_cached = functools.lru_cache(maxsize=1024)(self._predict_ml)
         
         # Load existing data if available
         self.load_training_data()
@@ -75,8 +126,40 @@ class TextToCADModel:
             {"text": "ring", "shape": "torus", "size": 0.8, "radius": 0.8, "height": 2, "color": 0x667eea, "position": [0,0,0]},
         ]
         
-        self.training_data = default_data
-        self.train_models()
+        self.set_training_data(default_data)
+        self.load_or_train_models()
+    
+    def _build_columns(self, data):
+        """Build a columnar view of the training data (text, shape and numeric arrays)"""
+        n = len(data)
+        texts = [d["text"] for d in data]
+        return {
+            "text": texts,
+            "counts": self.hasher.transform(texts) if n else sp.csr_matrix((0, self.hasher.n_features), dtype=self.hasher.dtype),
+            "shape": [d["shape"] for d in data],
+            "dimensions": np.fromiter(
+                (v for d in data for v in (d["size"], d["radius"], d["height"])),
+                dtype=np.float64, count=3 * n).reshape(n, 3),
+            "position": np.fromiter(
+                (v for d in data for v in d["position"]),
+                dtype=np.float64, count=3 * n).reshape(n, 3),
+        }
+    
+    def set_training_data(self, data):
+        """Replace the training data and rebuild its columnar view"""
+        self.training_data = data
+        self._cols = self._build_columns(data)
+    
+    def add_training_example(self, example):
+        """Append one training example, updating the columns incrementally"""
+        row = self._build_columns([example])
+        with self._lock:
+            self.training_data.append(example)
+            self._cols["text"].extend(row["text"])
+            self._cols["shape"].extend(row["shape"])
+            self._cols["counts"] = sp.vstack((self._cols["counts"], row["counts"]), format="csr")
+            self._cols["dimensions"] = np.vstack((self._cols["dimensions"], row["dimensions"]))
+            self._cols["position"] = np.vstack((self._cols["position"], row["position"]))
     
     def train_models(self):
         """Train all ML models on current training data"""
@@ -84,47 +167,116 @@ class TextToCADModel:
             print("Not enough training data")
             return
         
-        # Prepare data
-        texts = [d["text"] for d in self.training_data]
-        shapes = [d["shape"] for d in self.training_data]
-        sizes = [d["size"] for d in self.training_data]
-        radii = [d["radius"] for d in self.training_data]
-        heights = [d["height"] for d in self.training_data]
-        
-        # Fit vectorizer
-        X = self.vectorizer.fit_transform(texts).toarray()
-        
-        # Train classifiers
-        self.shape_classifier.fit(X, shapes)
-        self.size_predictor.fit(X, sizes)
-        self.radius_predictor.fit(X, radii)
-        self.height_predictor.fit(X, heights)
-        
-        # Train position clusterer
-        positions = np.array([d["position"] for d in self.training_data])
-        if len(positions) > 0:
-            self.position_clusterer.fit(positions)
-        
-        self.trained = True
-        print(f"[OK] Models trained on {len(self.training_data)} examples")
+        # One retrain at a time, so an older snapshot never replaces a newer one
+        with self._train_lock:
+            # Prepare data (snapshot, examples may be appended while fitting)
+            with self._lock:
+                cols = dict(self._cols, shape=list(self._cols["shape"]))
+                n_examples = len(cols["shape"])
+            
+            # Refit IDF weights on the already hashed term counts
+            tfidf = clone(self.tfidf).fit(cols["counts"])
+            # Like a fitted vocabulary, ignore words never seen in training: zeroing
+            # the IDF of empty buckets drops them before the L2 normalisation
+            tfidf.idf_ = np.where(cols["counts"].getnnz(axis=0) > 0, tfidf.idf_, 0)
+            X = tfidf.transform(cols["counts"])  # Sparse CSR, accepted by all estimators
+            
+            # Train classifiers on fresh estimators
+            shape_classifier = clone(self.shape_classifier).fit(X, cols["shape"])
+            dimension_predictor = clone(self.dimension_predictor).fit(X, cols["dimensions"])
+            self.quantize_models(dimension_predictor)
+            
+            # Position clusterer is fitted on first use, nothing consumes it yet
+            self._install_models(make_pipeline(self.hasher, tfidf), shape_classifier,
+                                 dimension_predictor, clone(self.position_clusterer), n_examples)
+            print(f"[OK] Models trained on {n_examples} examples")
+            self.save_models()
     
-    def predict(self, text):
-        """Predict shape parameters from text"""
-        if not self.trained:
+    def _install_models(self, vectorizer, shape_classifier, dimension_predictor,
+                        position_clusterer, n_examples):
+        """Swap in fitted models and invalidate cached predictions atomically"""
+        with self._lock:
+            self.vectorizer = vectorizer
+            self.hasher, self.tfidf = (step for _, step in vectorizer.steps)
+            self.shape_classifier = shape_classifier
+            self.dimension_predictor = dimension_predictor
+            self.position_clusterer = position_clusterer
+            self._kmeans_fitted = hasattr(position_clusterer, "cluster_centers_")
+            self._n_fitted = n_examples
+            self.fitted_models = (vectorizer, shape_classifier, dimension_predictor)
+            self.trained = True
+            self._predict_cached.cache_clear()
+    
+    @staticmethod
+    def quantize_models(dimension_predictor):
+        """Store the fitted regression weights as float32 to match the float32 features"""
+        # Random forest trees keep float64 values internally and cannot be recast
+        dimension_predictor.coef_ = dimension_predictor.coef_.astype(np.float32, copy=False)
+        dimension_predictor.intercept_ = np.asarray(
+            dimension_predictor.intercept_).astype(np.float32, copy=False)
+    
+    def save_models(self):
+        """Persist the fitted models so later process starts can skip training"""
+        with self._lock:
+            models = (self._n_fitted, self.vectorizer, self.shape_classifier,
+                      self.dimension_predictor, self.position_clusterer)
+        joblib.dump(models, MODELS_FILE, compress=3)
+    
+    def load_models(self):
+        """Load fitted models from disk if they are newer than the training data"""
+        if not os.path.exists(MODELS_FILE):
+            return False
+        if (os.path.exists(TRAINING_DATA_FILE)
+                and os.path.getmtime(TRAINING_DATA_FILE) > os.path.getmtime(MODELS_FILE)):
+            return False
+        
+        try:
+            n_examples, vectorizer, shape_classifier, dimension_predictor, position_clusterer = joblib.load(MODELS_FILE)
+        except Exception as e:
+            print(f"[WARN] Could not load {MODELS_FILE}: {e}")
+            return False
+        if n_examples != len(self.training_data):
+            return False
+        # The training columns were hashed with the current settings
+        if vectorizer.steps[0][1].get_params() != self.hasher.get_params():
+            return False
+        
+        self._install_models(vectorizer, shape_classifier, dimension_predictor,
+                             position_clusterer, n_examples)
+        print(f"[OK] Loaded models trained on {n_examples} examples from {MODELS_FILE}")
+        return True
+    
+    def load_or_train_models(self):
+        """Reuse persisted models when up to date, otherwise train from scratch"""
+        if not self.load_models():
+            self.train_models()
+    
+    def predict(self, text, models=None):
+        """Predict shape parameters from lowercased text, optionally with given fitted_models"""
+        if models is None:
+            models = self.fitted_models
+        if models is None:
             # Fallback to rule-based
             return self.rule_based_parse(text)
         
-        # Vectorize text
-        X = self.vectorizer.transform([text]).toarray()
+        # Callers mutate the result, so hand out a copy of the cached prediction
+        result = dict(self._predict_cached(models, text.strip()))
+        result["position"] = dict(result["position"])
+        return result
+    
+    def _predict_ml(self, models, text):
+        """Run the ML models on normalized text (memoized by predict)"""
+        vectorizer, shape_classifier, dimension_predictor = models
+        
+        # Vectorize text (kept sparse, the estimators accept CSR input)
+        X = vectorizer.transform([text])
         
         # Predict
-        shape = self.shape_classifier.predict(X)[0]
-        shape_proba = self.shape_classifier.predict_proba(X)[0]
+        shape_proba = shape_classifier.predict_proba(X)[0]
+        shape = shape_classifier.classes_[np.argmax(shape_proba)]
         confidence = float(max(shape_proba))
         
-        size = float(self.size_predictor.predict(X)[0])
-        radius = float(self.radius_predictor.predict(X)[0])
-        height = float(self.height_predictor.predict(X)[0])
+        size, radius, height = (float(v) for v in dimension_predictor.predict(X)[0])
         
         # Find similar examples for color
         color = self.find_similar_color(text)
@@ -139,29 +291,28 @@ class TextToCADModel:
             "confidence": confidence
         }
     
-    def find_similar_color(self, text):
-        """Find color from similar examples"""
-        text_lower = text.lower()
-        
+    def predict_position(self, position):
+        """Return the position cluster of a position, fitting K-Means on first use"""
+        with self._lock:
+            if not self._kmeans_fitted:
+                positions = self._cols["position"]
+                # Clustering is meaningless without enough distinct positions
+                if (len(positions) < self.position_clusterer.n_clusters
+                        or np.ptp(positions, axis=0).sum() == 0):
+                    return 0
+                self.position_clusterer.fit(positions)
+                self._kmeans_fitted = True
+            position_clusterer = self.position_clusterer
+        return int(position_clusterer.predict([position])[0])
+    
+    def find_similar_color(self, text_lower):
+        """Find color from similar examples (expects lowercased text)"""
         # Check for explicit color words
-        color_map = {
-            'red': 0xff4444, 'blue': 0x4444ff, 'green': 0x44ff44,
-            'yellow': 0xffff44, 'purple': 0xff44ff, 'orange': 0xff8844,
-            'cyan': 0x44ffff, 'white': 0xffffff, 'black': 0x222222,
-            'pink': 0xff88cc, 'brown': 0x8b4513, 'gray': 0x888888,
-            'grey': 0x888888
-        }
-        
-        for color_name, hex_value in color_map.items():
-            if color_name in text_lower:
-                return hex_value
-        
-        return 0x667eea  # Default purple
+        m = _COLOR_RE.search(text_lower)
+        return _COLOR_MAP[m.group(1)] if m else DEFAULT_COLOR
     
-    def rule_based_parse(self, text):
-        """Fallback rule-based parsing"""
-        text_lower = text.lower()
-        
+    def rule_based_parse(self, text_lower):
+        """Fallback rule-based parsing (expects lowercased text)"""
         # Detect shape
         if any(word in text_lower for word in ['sphere', 'ball', 'orb', 'globe']):
             shape = 'sphere'
@@ -189,26 +340,48 @@ class TextToCADModel:
             "size": size,
             "radius": size,
             "height": 2.5 if shape in ['cylinder', 'cone'] else 2.0,
-            "color": self.find_similar_color(text),
+            "color": self.find_similar_color(text_lower),
             "position": {"x": 0, "y": 0, "z": 0},
             "confidence": 0.7
         }
     
-    def save_training_data(self):
-        """Save training data to file"""
-        filepath = "training_data.json"
-        with open(filepath, 'w') as f:
-            json.dump(self.training_data, f, indent=2)
+    def save_training_data(self, new_example=None):
+        """Save training data to file, appending only new_example when the file exists"""
+        filepath = TRAINING_DATA_FILE
+        if new_example is not None and os.path.exists(filepath):
+            with open(filepath, 'ab') as f:
+                f.write(orjson.dumps(new_example) + b"\n")
+                self._appends_since_sync += 1
+                if self._appends_since_sync >= FSYNC_INTERVAL:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._appends_since_sync = 0
+        else:
+            # Full rewrite through a temporary file so a crash never leaves a partial file
+            tmp_path = filepath + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.writelines(orjson.dumps(d) + b"\n" for d in self.training_data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+            self._appends_since_sync = 0
         print(f"[OK] Saved {len(self.training_data)} training examples")
     
     def load_training_data(self):
         """Load training data from file"""
-        filepath = "training_data.json"
+        filepath = TRAINING_DATA_FILE
+        if not os.path.exists(filepath) and os.path.exists(LEGACY_TRAINING_DATA_FILE):
+            # One-time migration from the former JSON array file
+            with open(LEGACY_TRAINING_DATA_FILE, 'rb') as f:
+                self.set_training_data(orjson.loads(f.read()))
+            self.save_training_data()
+            print(f"[OK] Migrated {len(self.training_data)} training examples "
+                  f"from {LEGACY_TRAINING_DATA_FILE} to {filepath}")
         if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                self.training_data = json.load(f)
+            with open(filepath, 'rb') as f:
+                self.set_training_data([orjson.loads(line) for line in f if line.strip()])
             if len(self.training_data) >= 5:
-                self.train_models()
+                self.load_or_train_models()
                 print(f"[OK] Loaded {len(self.training_data)} training examples")
 
 # Initialize model
@@ -219,12 +392,57 @@ model = TextToCADModel()
 # ==========================
 
 class MultiObjectParser:
+    # Composite objects: (part text, position, size multiplier) per part
+    COMPOSITE_SHAPES = {
+        'house': [
+            ('cube walls', {"x": 0, "y": 0, "z": 0}, 3.0),  # walls
+            ('cone roof', {"x": 0, "y": 2, "z": 0}, 1.5),  # roof
+        ],
+        'table': [
+            ('cube top', {"x": 0, "y": 2, "z": 0}, 1.0),  # table top
+            ('cylinder leg', {"x": -1.5, "y": 0, "z": -1.5}, 0.3),  # legs
+            ('cylinder leg', {"x": 1.5, "y": 0, "z": -1.5}, 0.3),
+            ('cylinder leg', {"x": -1.5, "y": 0, "z": 1.5}, 0.3),
+            ('cylinder leg', {"x": 1.5, "y": 0, "z": 1.5}, 0.3),
+        ],
+        'snowman': [
+            ('large sphere', {"x": 0, "y": 0, "z": 0}, 2.0),  # body
+            ('sphere', {"x": 0, "y": 2.5, "z": 0}, 1.5),  # torso
+            ('small sphere', {"x": 0, "y": 4.2, "z": 0}, 1.0),  # head
+        ],
+    }
+    
     def __init__(self, ml_model):
         self.model = ml_model
+        
+        # Leading word boundary only, so plurals and possessives still match
+        self._composite_re = re.compile(r'\b(?:' + '|'.join(self.COMPOSITE_SHAPES) + ')')
+        
+        # Part predictions never depend on the request, so compute them once
+        # per fitted models snapshot instead of on every composite request.
+        # Stored as one (models, parts by name) tuple so both change together.
+        self._composite_cache = None
+        
+        # Keywords that indicate multiple objects, compiled into one pattern
+        self._multi_re = re.compile(
+            r'\d+\s+(?:spheres|cubes|cylinders|cones)'  # "3 cubes"
+            r'|and\s+(?:a|an)'  # "sphere and cube"
+            r'|with\s+(?:a|an|\d+)'  # "table with legs"
+            r'|stack|multiple|several'
+            r'|above|below|next to|on top'
+        )
+        
+        # Quantity ("3 cubes") and stacking ("stack 3 blocks") in one pattern
+        self._multi_extract = re.compile(
+            r'(?P<stack>stack)\s+(?P<stack_count>\d+)\s+'
+            r'(?P<stack_shape>sphere|cube|cylinder|cone|torus|ball|box|tube|\w+?)(?:es|s)?\b'
+            r'|(?P<count>\d+)\s+(?P<shape>sphere|cube|cylinder|cone|torus|ball|box|tube)s?'
+        )
     
-    def parse(self, text):
+    def parse(self, text, text_lower=None):
         """Parse text and detect multiple objects"""
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         objects = []
         
         # Check for multiple objects
@@ -232,26 +450,14 @@ class MultiObjectParser:
             objects = self.extract_multiple_objects(text_lower)
         else:
             # Single object
-            obj = self.model.predict(text)
+            obj = self.model.predict(text_lower)
             objects = [obj]
         
         return objects
     
     def is_multi_object(self, text):
         """Check if text describes multiple objects"""
-        # Keywords that indicate multiple objects
-        multi_indicators = [
-            r'\d+\s+(spheres|cubes|cylinders|cones)', # "3 cubes"
-            r'and\s+(?:a|an)', # "sphere and cube"
-            r'with\s+(?:a|an|\d+)', # "table with legs"
-            r'stack', 'multiple', 'several',
-            r'above', r'below', r'next to', r'on top'
-        ]
-        
-        for pattern in multi_indicators:
-            if re.search(pattern, text):
-                return True
-        return False
+        return self._multi_re.search(text) is not None
     
     def extract_multiple_objects(self, text):
         """Extract multiple objects from text"""
@@ -266,11 +472,24 @@ class MultiObjectParser:
                 objects.append(obj)
             return objects
         
-        # Pattern 2: Number of objects (e.g., "3 cubes")
-        quantity_match = re.search(r'(\d+)\s+(sphere|cube|cylinder|cone|torus|ball|box|tube)s?', text)
-        if quantity_match:
-            count = int(quantity_match.group(1))
-            shape_text = quantity_match.group(2)
+        match = self._multi_extract.search(text)
+        if match:
+            # Pattern 2: Stacking (e.g., "stack 3 cubes")
+            if match.group('stack'):
+                count = int(match.group('stack_count'))
+                shape_text = match.group('stack_shape')
+                
+                y_offset = 0
+                for i in range(min(count, 10)):
+                    obj = self.model.predict(shape_text)
+                    obj['position'] = {"x": 0, "y": y_offset, "z": 0}
+                    y_offset += obj['size'] * 2  # Stack vertically
+                    objects.append(obj)
+                return objects
+            
+            # Pattern 3: Number of objects (e.g., "3 cubes")
+            count = int(match.group('count'))
+            shape_text = match.group('shape')
             
             for i in range(min(count, 10)):  # Max 10 objects
                 obj = self.model.predict(shape_text)
@@ -279,49 +498,11 @@ class MultiObjectParser:
                 objects.append(obj)
             return objects
         
-        # Pattern 3: Composite objects (e.g.,"house")
-        composite_shapes = {
-            'house': [
-                ('cube walls', {"x": 0, "y": 0, "z": 0}, 3.0),  # walls
-                ('cone roof', {"x": 0, "y": 2, "z": 0}, 1.5),  # roof
-            ],
-            'table': [
-                ('cube top', {"x": 0, "y": 2, "z": 0}, 1.0),  # table top
-                ('cylinder leg', {"x": -1.5, "y": 0, "z": -1.5}, 0.3),  # legs
-                ('cylinder leg', {"x": 1.5, "y": 0, "z": -1.5}, 0.3),
-                ('cylinder leg', {"x": -1.5, "y": 0, "z": 1.5}, 0.3),
-                ('cylinder leg', {"x": 1.5, "y": 0, "z": 1.5}, 0.3),
-            ],
-            'snowman': [
-                ('large sphere', {"x": 0, "y": 0, "z": 0}, 2.0),  # body
-                ('sphere', {"x": 0, "y": 2.5, "z": 0}, 1.5),  # torso
-                ('small sphere', {"x": 0, "y": 4.2, "z": 0}, 1.0),  # head
-            ],
-        }
-        
-        for composite_name, parts in composite_shapes.items():
-            if composite_name in text:
-                for part_text, position, size_mult in parts:
-                    obj = self.model.predict(part_text)
-                    obj['position'] = position
-                    obj['size'] *= size_mult
-                    obj['radius'] *= size_mult
-                    objects.append(obj)
-                return objects
-        
-        # Pattern 4: Stacking (e.g., "stack 3 cubes")
-        stack_match = re.search(r'stack\s+(\d+)\s+(\w+)', text)
-        if stack_match:
-            count = int(stack_match.group(1))
-            shape_text = stack_match.group(2)
-            
-            y_offset = 0
-            for i in range(min(count, 10)):
-                obj = self.model.predict(shape_text)
-                obj['position'] = {"x": 0, "y": y_offset, "z": 0}
-                y_offset += obj['size'] * 2  # Stack vertically
-                objects.append(obj)
-            return objects
+        # Pattern 4: Composite objects (e.g.,"house")
+        composite_match = self._composite_re.search(text)
+        if composite_match:
+            parts = self.composite_parts(composite_match.group(0))
+            return [dict(obj, position=dict(obj['position'])) for obj in parts]
         
         # Fallback: single object
         obj = self.model.predict(text)
@@ -329,6 +510,25 @@ class MultiObjectParser:
         
         return objects
 
+    def composite_parts(self, composite_name):
+        """Return the precomputed part objects of a composite shape"""
+        models = self.model.fitted_models
+        cache = self._composite_cache
+        if cache is None or cache[0] is not models:
+            parts_by_name = {}
+            for name, parts in self.COMPOSITE_SHAPES.items():
+                objects = []
+                for part_text, position, size_mult in parts:
+                    obj = self.model.predict(part_text, models)
+                    obj['position'] = position
+                    obj['size'] *= size_mult
+                    obj['radius'] *= size_mult
+                    objects.append(obj)
+                parts_by_name[name] = objects
+            cache = (models, parts_by_name)
+            self._composite_cache = cache
+        return cache[1][composite_name]
+
 # Initialize parser
 parser = MultiObjectParser(model)
 
@@ -336,6 +536,23 @@ parser = MultiObjectParser(model)
 # API ENDPOINTS
 # ==========================
 
+_interactions_lock = threading.Lock()
+
+def save_interaction(timestamp_ns, text, objects):
+    """Append one /parse-text interaction to the interactions log"""
+    interaction = {
+        "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9).isoformat(),
+        "input": text,
+        "output": objects
+    }
+    line = orjson.dumps(interaction, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+    # Best-effort: a failed log write must not fail the request
+    try:
+        with _interactions_lock, open(INTERACTIONS_FILE, 'ab') as f:
+            f.write(line)
+    except OSError as e:
+        print(f"[WARN] Could not log interaction to {INTERACTIONS_FILE}: {e}")
+
 @app.route('/parse-text', methods=['POST'])
 def parse_text():
     """Main endpoint for text to CAD conversion"""
@@ -347,16 +564,13 @@ def parse_text():
             return jsonify({"error": "No text provided"}), 400
         
         # Parse into objects
-        objects = parser.parse(text)
+        # Lowercase once and pass it through the parser and model
+        text_lower = text.lower()
+        objects = parser.parse(text, text_lower)
         
         # Save interaction for learning
-        interaction = {
-            "timestamp": datetime.now().isoformat(),
-            "input": text,
-            "output": objects
-        }
-        
-        # Could save this and retrain periodically
+        if app.config.get("LOG_INTERACTIONS"):
+            save_interaction(time.time_ns(), text, objects)
         
         response = {
             "objects": objects,
@@ -365,7 +579,9 @@ def parse_text():
             "ml_powered": model.trained
         }
         
-        return jsonify(response)
+        # orjson also encodes the numpy scalars returned by the models
+        return Response(orjson.dumps(response, option=orjson.OPT_SERIALIZE_NUMPY),
+                        mimetype="application/json")
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -387,9 +603,10 @@ def retrain():
         new_example = data.get('example')
         
         if new_example:
-            model.training_data.append(new_example)
+            model.add_training_example(new_example)
+            # Save the data first so the persisted models end up the newer file
+            model.save_training_data(new_example)
             model.train_models()
-            model.save_training_data()
         
         return jsonify({
             "status": "retrained",
@@ -409,4 +626,10 @@ if __name__ == '__main__':
     print("  GET  /health     - Check server status")
     print("  POST /retrain    - Add training data\n")
     
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[WARN] waitress not installed, falling back to the Flask development server")
+        app.run(port=5000, host='0.0.0.0', threaded=True)
+    else:
+        serve(app, host='0.0.0.0', port=5000, threads=8)